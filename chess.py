@@ -8,7 +8,7 @@ import functools
 
 import numpy as np
 
-from search import minmax, iterative_deepening
+from search import minmax, pvs, iterative_deepening
 from chessboard import Move, ChessBoard, SIZE, ALL_PIECES
 
 
@@ -260,14 +260,12 @@ def human_player(board: ChessBoard) -> Move:
 
 
 def computer_player(board: ChessBoard, params: Dict = {}) -> Move:
-    """Wrapper for minmax and eval board options.
+    """Wrapper for pvs and eval board options.
     The param dict gets passed down to minmax and the eval_fn.
     Full list of possible params:
         search:
-            depth: original max_depth passed to minmax
+            depth: original max_depth passed to pvs
             time_discount: how much to discount each turn
-            explore_ratio: fraction of possible moves to explore
-            min_branches: overrides explore_ratio in case there are few branches
         eval:
             piece_tables: bool to include piece_tables in the score
             material: bool to include material in the score
@@ -275,7 +273,7 @@ def computer_player(board: ChessBoard, params: Dict = {}) -> Move:
     """
 
     depth = params.get("depth", 5)
-    _, move = minmax(board, eval_chess_board, depth)
+    _, move = pvs(board, eval_chess_board, depth, params=params)
     return move
 
 
@@ -20,6 +20,18 @@ SIZE = 8
 WHITE_PIECES = ["P", "R", "N", "B", "K", "Q"]
 BLACK_PIECES = [p.lower() for p in WHITE_PIECES]
 ALL_PIECES = WHITE_PIECES + BLACK_PIECES
+PIECE_RANKS = {"p": 1, "n": 2, "b": 3, "r": 4, "q": 5, "k": 6}  # rough order of piece value
+CASTLE_FLAGS = ["w_castle_left", "w_castle_right", "b_castle_left", "b_castle_right"]
+
+# Zobrist hashing: every feature of a position gets a random 64 bit key, and a position's hash
+# is the XOR of all its features. Moving a piece only needs a couple XORs to update the hash.
+# Seeded so that hashes are stable between processes.
+# https://www.chessprogramming.org/Zobrist_Hashing
+_ZOBRIST_RNG = np.random.RandomState(2019)
+ZOBRIST_PIECES = {p: _ZOBRIST_RNG.randint(0, 2 ** 64, size=(SIZE, SIZE), dtype=np.uint64).tolist() for p in ALL_PIECES}
+ZOBRIST_CASTLE = {f: int(_ZOBRIST_RNG.randint(0, 2 ** 64, dtype=np.uint64)) for f in CASTLE_FLAGS}
+ZOBRIST_EN_PASSANT = _ZOBRIST_RNG.randint(0, 2 ** 64, size=(SIZE, SIZE), dtype=np.uint64).tolist()
+ZOBRIST_BLACK_TO_MOVE = int(_ZOBRIST_RNG.randint(0, 2 ** 64, dtype=np.uint64))
 
 
 def inbound(r, c):
@@ -47,6 +59,7 @@ class Move(object):
         self.c_to = c_to
         self.special = special
         self.old_flags = {}  # filled in by do_move, for undoing later
+        self.old_hash = 0  # filled in by do_move, for undoing later
 
         # optional and are filled in by the board when doing a move
         self.piece = piece
@@ -78,12 +91,15 @@ class ChessBoard(object):
     """Class to represent a chessboard.
     Board is represented by a 2D array + a piece set, which must be kept in sync.
     Several extra flags store information for special moves that require info about the past, i.e. castling
+    A Zobrist hash of the position is kept up to date by do_move / undo_move. If you edit the board array
+    directly, call _reset_piece_set() to resync the piece set and hash.
     """
     TURNS = ["white", "black"]
 
     def __init__(self):
         self.board = np.full(shape=(SIZE, SIZE), fill_value=".", dtype="<U1")
         self.piece_set: Set[Tuple[str, int, int]] = set()  # caches pieces for speedup
+        self._hash = 0  # zobrist hash of pieces and flags. side to move is added by self.hash
 
         # some special moves require past info of board state
         self.flags = dict(
@@ -105,14 +121,34 @@ class ChessBoard(object):
         else:
             return "white"
 
+    @property
+    def hash(self) -> int:
+        """64 bit Zobrist hash of the position, including side to move, castling and en passant"""
+        if self.turn == "black":
+            return self._hash ^ ZOBRIST_BLACK_TO_MOVE
+        return self._hash
+
+    def _flags_hash(self) -> int:
+        """Zobrist hash of just the castling and en passant flags"""
+        h = 0
+        for flag in CASTLE_FLAGS:
+            if self.flags[flag]:
+                h ^= ZOBRIST_CASTLE[flag]
+        en_passant = self.flags["en_passant_spot"]
+        if en_passant is not None:
+            h ^= ZOBRIST_EN_PASSANT[en_passant[0]][en_passant[1]]
+        return h
+
     def _reset_piece_set(self) -> None:
-        """Sets the piece list from the ground truth of the board"""
+        """Sets the piece list and hash from the ground truth of the board"""
         self.piece_set = set()
+        self._hash = self._flags_hash()
         for r in range(SIZE):
             for c in range(SIZE):
                 p = self.board[r, c]
                 if p != ".":
                     self.piece_set.add((p, r, c))
+                    self._hash ^= ZOBRIST_PIECES[p][r][c]
 
     def clear_pieces(self) -> None:
         """Remove all pieces from the board"""
@@ -304,15 +340,43 @@ class ChessBoard(object):
 
         return all_moves
 
+    def captures(self, turn=None) -> Sequence[Move]:
+        """Like moves(), but only returns moves that capture a piece. Used by quiescence search.
+        Sorted with the most valuable victims first, and the least valuable attackers first after that."""
+        pieces = self.find_my_pieces(turn)
+
+        all_captures = []
+        for piece, r_from, c_from in pieces:
+            for r_to, c_to in self.get_dests_for_piece(r_from, c_from):
+                captured = self.board[r_to, c_to]
+                if captured != ".":
+                    all_captures.append(Move(r_from, c_from, r_to, c_to, piece=piece, captured=captured))
+        all_captures.sort(key=lambda m: 8 * PIECE_RANKS[m.piece.lower()] - PIECE_RANKS[m.captured.lower()])
+        return all_captures
+
+    def encode_move(self, move: Move) -> int:
+        """Packs a move into a 12 bit int: from and to squares as row * 8 + column"""
+        return ((move.r_from * SIZE + move.c_from) * SIZE + move.r_to) * SIZE + move.c_to
+
+    def decode_move(self, code: int) -> Move:
+        """Inverse of encode_move"""
+        code, c_to = divmod(code, SIZE)
+        code, r_to = divmod(code, SIZE)
+        r_from, c_from = divmod(code, SIZE)
+        return Move(r_from, c_from, r_to, c_to)
+
     def do_move(self, move: Move):
         """Do a move on the chessboard"""
         piece = self.board[move.r_from, move.c_from]  # type: str
+        start_piece = piece  # differs from piece after a promotion
         captured = self.board[move.r_to, move.c_to]  # type: str
         self.board[move.r_from, move.c_from] = "."
         self.board[move.r_to, move.c_to] = piece
 
         # save current state of flags for undoing later
         move.old_flags = deepcopy(self.flags)
+        move.old_hash = self._hash
+        self._hash ^= self._flags_hash()  # remove old flags from the hash
 
         # record info for future En Passant
         if piece.lower() == "p" and abs(move.r_from - move.r_to) == 2:  # detect a double jump to enable en passant
@@ -350,11 +414,15 @@ class ChessBoard(object):
 
         self.turn = self.next_turn()
 
-        # update piece set datastructure
-        self.piece_set.remove((piece, move.r_from, move.c_from))
+        # update piece set datastructure and hash
+        self.piece_set.remove((start_piece, move.r_from, move.c_from))
+        self._hash ^= ZOBRIST_PIECES[start_piece][move.r_from][move.c_from]
         if captured != ".":
             self.piece_set.remove((captured, move.r_to, move.c_to))
+            self._hash ^= ZOBRIST_PIECES[captured][move.r_to][move.c_to]
         self.piece_set.add((piece, move.r_to, move.c_to))
+        self._hash ^= ZOBRIST_PIECES[piece][move.r_to][move.c_to]
+        self._hash ^= self._flags_hash()  # add new flags to the hash
 
         # save move
         move.captured = captured
@@ -372,6 +440,7 @@ class ChessBoard(object):
 
         # undo recorded info needed for special moves.
         self.flags = deepcopy(move.old_flags)
+        self._hash = move.old_hash
 
         # special moves
         if move.special == "c":  # castle
@@ -393,7 +462,7 @@ class ChessBoard(object):
         self.piece_set.add((piece, move.r_from, move.c_from))
         if captured != ".":
             self.piece_set.add((captured, move.r_to, move.c_to))
-        self.piece_set.remove((piece, move.r_to, move.c_to))
+        self.piece_set.remove((move.piece, move.r_to, move.c_to))
 
     def print_move(self, move: Move):
         """Graphically represents a move"""
@@ -1,27 +1,81 @@
 #!/usr/bin/env python3
 
+import time
+
 import numpy as np
 
-TRANSPOSITION_TABLE = {}
-# Maps (board+depth) -> score to avoid repeated work and improve move ordering
-# key: str(board.board.flatten()) + depth
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+TRANSPOSITION_TABLE = TranspositionTable()
+# Maps board.hash -> (depth, score, bound flag, best move) to avoid repeated work and improve move ordering.
+# Fixed size, replace it with a TranspositionTable(size_mb) to change the memory budget.
+# Scores are stored from the point of view of the side to move, before the time discount.
+
+FLIP_BOUND = {EXACT: EXACT, LOWER: UPPER, UPPER: LOWER}  # a lower bound for one side is an upper bound for the other
+INF = 10 ** 9  # larger than any score. ints keep the null windows of pvs exact
+
+
+class SearchTimeout(Exception):
+    """Raised from inside the search when the deadline has passed"""
+    pass
 
 
-def iterative_deepening(board, eval_fn, max_depth, max_t=10.0):
-    """Iteratively calls minmax with higher depths.
-    1. this allows us to gracefully add a time limit.
-    2. NOTE: should fill up the transposition table for better move ordering,
-    but using that for move ordering doesn't seem to be better than the straight eval_fn
+def _unwind(board, num_moves):
+    """Undo moves until the board is back to having num_moves past moves.
+    Used to clean up after a search is aborted part way down the tree."""
+    while len(board.past_moves) > num_moves:
+        board.undo_move()
+
+
+def principal_variation(board, max_len=10):
+    """Follows the best moves stored in the transposition table from this position.
+    Returns the list of moves the search expects to be played."""
+    pv = []
+    seen = set()
+    while len(pv) < max_len and board.hash not in seen:
+        seen.add(board.hash)
+        entry = TRANSPOSITION_TABLE.probe(board.hash)
+        if entry is None or entry[3] is None:
+            break
+        move = board.decode_move(entry[3])
+        if move not in board.moves():
+            break  # hash collision
+        pv.append(move)
+        board.do_move(move)
+    for _ in pv:
+        board.undo_move()
+    return pv
+
+
+def iterative_deepening(board, eval_fn, max_depth, max_t=10.0, params=None):
+    """Iteratively calls pvs with higher depths.
+    1. this allows us to gracefully add a time limit. The deadline is checked at every node,
+    so an iteration that runs out of time is abandoned and the last completed one is used.
+    2. each iteration fills up the transposition table with best moves, which the next iteration
+    searches first. So the previous principal variation is always explored first.
+    Depth 1 is always completed, so there is always a move to return.
 
     Returns: (score, move)
     """
     t0 = time.time()
+    TRANSPOSITION_TABLE.new_search()
+    params = {} if params is None else params
     score, move = None, None
-    for depth in range(max_depth + 1):
-        tot_t = time.time() - t0
-        if tot_t > max_t:
+    for depth in range(1, max_depth + 1):
+        if depth == 1:
+            depth_params = params
+        else:
+            depth_params = dict(params, deadline=t0 + max_t)
+
+        num_moves = len(board.past_moves)
+        try:
+            score, move = pvs(board, eval_fn, depth, params=depth_params)
+        except SearchTimeout:
+            _unwind(board, num_moves)
+            break
+
+        if time.time() - t0 > max_t:
             break
-        score, move = minmax(board, eval_fn, depth)
     return score, move
 
 
@@ -33,6 +87,8 @@ def minmax(board, eval_fn, max_depth, alpha=-np.inf, beta=np.inf, params={}):
         [...] = board.moves()
         board.do_move(move)
         board.undo_move()
+        board.hash: int hash of the position, including whose turn it is
+        board.encode_move(move) / board.decode_move(int): pack moves into 16 bits for the transposition table
     eval_fn: a function that transforms a board into a score
         score, over = eval_fn(board)
     max_depth: how many more layers to search.
@@ -40,8 +96,10 @@ def minmax(board, eval_fn, max_depth, alpha=-np.inf, beta=np.inf, params={}):
     beta:   worst possible score for "o" = +inf
     params: optional dict for controlling search and eval:
         time_discount: how much to discount each turn
-        explore_ratio: fraction of possible moves to explore
-        min_branches: overrides explore_ratio in case there are few branches
+        quiescence: bool to keep searching captures past max_depth. (pvs only, default True)
+        explore_ratio: fraction of possible moves to explore (minmax only)
+        min_branches: overrides explore_ratio in case there are few branches (minmax only)
+        deadline: time.time() after which to abort the search by raising SearchTimeout
         ... others passed on to eval_fn
 
     returns: (score, move) the expected score down that path.
@@ -49,6 +107,10 @@ def minmax(board, eval_fn, max_depth, alpha=-np.inf, beta=np.inf, params={}):
 
     TIME_DISCOUNT = params.get("time_discount", 0.95)
 
+    deadline = params.get("deadline")
+    if deadline is not None and time.time() > deadline:
+        raise SearchTimeout()
+
     # base cases
     score, done = eval_fn(board, params)
     if done or max_depth == 0:
@@ -57,11 +119,35 @@ def minmax(board, eval_fn, max_depth, alpha=-np.inf, beta=np.inf, params={}):
     # are we maxing or mining?
     direction = 1.0 if board.turn in ["x", "white"] else -1.0  # TODO: make turn binary?
 
+    # have we already searched this position?
+    # the table is shared with pvs, so scores are stored relative to the side to move, before discounting
+    hash_move = None
+    entry = TRANSPOSITION_TABLE.probe(board.hash)
+    if entry is not None:
+        tt_depth, tt_score, tt_flag, tt_move = entry
+        if tt_move is not None:
+            hash_move = board.decode_move(tt_move)
+        if tt_depth >= max_depth:
+            tt_score *= direction
+            if direction < 0:
+                tt_flag = FLIP_BOUND[tt_flag]
+            if tt_flag == EXACT:
+                return int(tt_score * TIME_DISCOUNT), hash_move
+            elif tt_flag == LOWER:
+                alpha = max(alpha, tt_score)
+            elif tt_flag == UPPER:
+                beta = min(beta, tt_score)
+            if beta <= alpha:
+                return int(tt_score * TIME_DISCOUNT), hash_move
+
     # loop!
+    alpha_orig, beta_orig = alpha, beta  # window actually searched, after narrowing
     best_move = None
     best_score = -np.inf * direction
 
     all_moves = board.moves()
+    if not all_moves:
+        return score, None
 
     # order these nicely to improve alpha beta pruning
     def score_move_heuristic(move):
@@ -77,8 +163,13 @@ def minmax(board, eval_fn, max_depth, alpha=-np.inf, beta=np.inf, params={}):
         board.do_move(move)
         score, _ = eval_fn(board)
         board.undo_move()
+        TRANSPOSITION_TABLE.store(board.hash, max_depth, int(score * direction), EXACT, board.encode_move(move))
         return int(score * TIME_DISCOUNT), move
 
+    # the best move from an earlier search goes first
+    if hash_move is not None and hash_move in all_moves:
+        all_moves.insert(0, all_moves.pop(all_moves.index(hash_move)))
+
     # search the tree!
     explore_ratio = params.get("explore_ratio", 1.0)
     min_branches = params.get("min_branches", 10)
@@ -86,15 +177,7 @@ def minmax(board, eval_fn, max_depth, alpha=-np.inf, beta=np.inf, params={}):
 
     for move in all_moves[:num_to_explore]:
         board.do_move(move)
-        # add to transposition table
-        key = "".join(board.board.flatten()) + str(max_depth - 1)
-
-        if key in TRANSPOSITION_TABLE:
-            score = TRANSPOSITION_TABLE[key]
-        else:
-            score, _ = minmax(board, eval_fn, max_depth - 1, alpha, beta, params)
-            TRANSPOSITION_TABLE[key] = score
-
+        score, _ = minmax(board, eval_fn, max_depth - 1, alpha, beta, params)
         board.undo_move()
 
         if score * direction > best_score * direction:
@@ -109,4 +192,167 @@ def minmax(board, eval_fn, max_depth, alpha=-np.inf, beta=np.inf, params={}):
         if beta <= alpha:  # we know the parent won't choose us. abandon the search!
             break
 
+    # a cutoff means we only know a bound on the score, not the score itself
+    if best_score <= alpha_orig:
+        flag = UPPER
+    elif best_score >= beta_orig:
+        flag = LOWER
+    else:
+        flag = EXACT
+    if direction < 0:
+        flag = FLIP_BOUND[flag]
+    TRANSPOSITION_TABLE.store(board.hash, max_depth, int(best_score * direction), flag, board.encode_move(best_move))
+    return int(best_score * TIME_DISCOUNT), best_move
+
+
+
+def pvs(board, eval_fn, max_depth, alpha=-np.inf, beta=np.inf, params=None):
+    """Finds the best move using Principal Variation Search, a negamax form of alpha beta.
+    Drop in replacement for minmax: same board protocol, same arguments, same (score, move) return
+    with scores positive for "white" / "x".
+
+    The first move at each node is searched with the full window. Every later move only gets a
+    zero width "scout" window, which just proves it is no better than the first. If a scout fails
+    high the move is re-searched with the full window.
+    https://www.chessprogramming.org/Principal_Variation_Search
+
+    returns: (score, move) the expected score down that path.
+    """
+    params = {} if params is None else params
+    alpha = max(alpha, -INF)
+    beta = min(beta, INF)
+
+    if board.turn in ["x", "white"]:
+        return _pvs(board, eval_fn, max_depth, alpha, beta, 1, params)
+    score, move = _pvs(board, eval_fn, max_depth, -beta, -alpha, -1, params)
+    return -score, move
+
+
+def _pvs(board, eval_fn, depth, alpha, beta, color, params):
+    """Recursive part of pvs.
+    color: 1 if it's "white" / "x" to move, else -1. Flipped at each ply instead of looking at board.turn.
+    alpha, beta, and the returned score are all from the point of view of the side to move.
+
+    The time discount is applied to the score a node returns, so the window handed to children is
+    divided by it. That keeps fail high / fail low results exact bounds.
+    """
+    TIME_DISCOUNT = params.get("time_discount", 0.95)
+
+    deadline = params.get("deadline")
+    if deadline is not None and time.time() > deadline:
+        raise SearchTimeout()
+
+    quiescence = params.get("quiescence", True) and hasattr(board, "captures")
+    if depth == 0 and quiescence:
+        return _quiesce(board, eval_fn, alpha, beta, color, params), None
+
+    # base cases
+    score, done = eval_fn(board, params)
+    if done or depth == 0:
+        return color * score, None
+
+    # have we already searched this position?
+    hash_move = None
+    entry = TRANSPOSITION_TABLE.probe(board.hash)
+    if entry is not None:
+        tt_depth, tt_score, tt_flag, tt_move = entry
+        if tt_move is not None:
+            hash_move = board.decode_move(tt_move)
+        if tt_depth >= depth:
+            if tt_flag == EXACT:
+                return int(tt_score * TIME_DISCOUNT), hash_move
+            elif tt_flag == LOWER:
+                alpha = max(alpha, tt_score)
+            elif tt_flag == UPPER:
+                beta = min(beta, tt_score)
+            if beta <= alpha:
+                return int(tt_score * TIME_DISCOUNT), hash_move
+
+    alpha_orig = alpha  # window actually searched, after narrowing
+    all_moves = board.moves()
+    if not all_moves:
+        return color * score, None
+
+    # order moves by a quick evaluation of the resulting board
+    def score_move_heuristic(move):
+        board.do_move(move)
+        score, _ = eval_fn(board, params)
+        board.undo_move()
+        return color * score
+    scored_moves = [(score_move_heuristic(move), i, move) for i, move in enumerate(all_moves)]
+    scored_moves.sort(reverse=True)
+
+    # the children are leaves and we've already evaluated them
+    if depth == 1 and not quiescence:
+        best_score, _, best_move = scored_moves[0]
+        TRANSPOSITION_TABLE.store(board.hash, depth, int(best_score), EXACT, board.encode_move(best_move))
+        return int(best_score * TIME_DISCOUNT), best_move
+
+    all_moves = [move for _, _, move in scored_moves]
+    if hash_move is not None and hash_move in all_moves:
+        all_moves.insert(0, all_moves.pop(all_moves.index(hash_move)))
+
+    # search the tree!
+    best_score, best_move = -INF, None
+    for i, move in enumerate(all_moves):
+        board.do_move(move)
+        if i == 0:
+            score = -_pvs(board, eval_fn, depth - 1, -beta / TIME_DISCOUNT, -alpha / TIME_DISCOUNT, -color, params)[0]
+        else:
+            # scout: prove this move is no better than alpha
+            score = -_pvs(
+                board, eval_fn, depth - 1, -(alpha + 1) / TIME_DISCOUNT, -alpha / TIME_DISCOUNT, -color, params
+            )[0]
+            if alpha < score < beta:  # it is better, find out by how much
+                score = -_pvs(
+                    board, eval_fn, depth - 1, -beta / TIME_DISCOUNT, -alpha / TIME_DISCOUNT, -color, params
+                )[0]
+        board.undo_move()
+
+        if score > best_score:
+            best_score = score
+            best_move = move
+        alpha = max(alpha, score)
+        if alpha >= beta:  # we know the parent won't choose us. abandon the search!
+            break
+
+    # a cutoff means we only know a bound on the score, not the score itself
+    if best_score <= alpha_orig:
+        flag = UPPER
+    elif best_score >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    TRANSPOSITION_TABLE.store(board.hash, depth, best_score, flag, board.encode_move(best_move))
     return int(best_score * TIME_DISCOUNT), best_move
+
+
+def _quiesce(board, eval_fn, alpha, beta, color, params):
+    """Searches only captures until the position is quiet, so that leaf evaluations aren't taken
+    half way through an exchange. The side to move can always "stand pat" and decline to capture,
+    so the static eval is a lower bound on the score.
+    Needs board.captures(). Scores are from the point of view of the side to move.
+    https://www.chessprogramming.org/Quiescence_Search
+    """
+    deadline = params.get("deadline")
+    if deadline is not None and time.time() > deadline:
+        raise SearchTimeout()
+
+    score, done = eval_fn(board, params)
+    stand_pat = color * score
+    if done or stand_pat >= beta:
+        return stand_pat
+
+    best_score = stand_pat
+    alpha = max(alpha, stand_pat)
+    for move in board.captures():
+        board.do_move(move)
+        score = -_quiesce(board, eval_fn, -beta, -alpha, -color, params)
+        board.undo_move()
+
+        if score > best_score:
+            best_score = score
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            break
+    return best_score
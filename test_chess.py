@@ -673,3 +673,33 @@ def test_castle_flags():
         not b.flags["b_castle_left"],
         b.flags["w_castle_right"],
         b.flags["w_castle_left"])), "back to normal after undo move"
+
+
+def test_hash():
+    b = ChessBoard()
+    start_hash = b.hash
+
+    # incremental hash matches a from-scratch hash, and undo restores it
+    moves = [Move(6, 4, 4, 4), Move(1, 3, 3, 3), Move(4, 4, 3, 3), Move(0, 4, 1, 3)]  # ends with a capture
+    for m in moves:
+        b.do_move(m)
+        h = b.hash
+        b._reset_piece_set()
+        assert h == b.hash
+    for _ in moves:
+        b.undo_move()
+    assert b.hash == start_hash
+
+    # side to move is part of the hash
+    b.turn = "black"
+    assert b.hash != start_hash
+    b.turn = "white"
+
+    # so are castling and en passant
+    b.flags["w_castle_left"] = False
+    b._reset_piece_set()
+    assert b.hash != start_hash
+    b.flags["w_castle_left"] = True
+    b.flags["en_passant_spot"] = (4, 4)
+    b._reset_piece_set()
+    assert b.hash != start_hash
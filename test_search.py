@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+import pytest
+
+from chess import eval_chess_board
+from chessboard import ChessBoard
+from search import iterative_deepening, minmax, principal_variation, pvs, TRANSPOSITION_TABLE
+from tictactoe import TicTacToeBoard, eval_tictactoe, WIN_SCORE
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+
+@pytest.fixture(autouse=True)
+def clear_transposition_table():
+    """Don't leak search results into other tests"""
+    TRANSPOSITION_TABLE.clear()
+    yield
+    TRANSPOSITION_TABLE.clear()
+
+
+def test_tt_store_probe():
+    tt = TranspositionTable(size_mb=1)
+    assert tt.probe(1234) is None
+
+    tt.store(1234, 3, -50, EXACT, 17)
+    assert tt.probe(1234) == (3, -50, EXACT, 17)
+
+    # a new result without a move keeps the old best move
+    tt.store(1234, 4, 20, LOWER)
+    assert tt.probe(1234) == (4, 20, LOWER, 17)
+
+    # hashes use the full 64 bits
+    big = 2 ** 64 - 1
+    tt.store(big, 1, 5, UPPER)
+    assert tt.probe(big) == (1, 5, UPPER, None)
+
+
+def test_tt_replacement():
+    tt = TranspositionTable(size_mb=1)
+    n = tt.n_buckets
+    deep, shallow, other = 7, 7 + n, 7 + 2 * n  # all in the same bucket
+
+    tt.store(deep, 5, 1, EXACT)
+    tt.store(shallow, 2, 2, EXACT)
+    assert tt.probe(deep) is not None, "deep entry is kept"
+    assert tt.probe(shallow) is not None
+
+    tt.store(other, 1, 3, EXACT)
+    assert tt.probe(deep) is not None, "deep entry is still kept"
+    assert tt.probe(shallow) is None, "always-replace slot was overwritten"
+    assert tt.probe(other) is not None
+
+    # entries from old searches get replaced
+    tt.new_search()
+    tt.store(shallow, 1, 4, EXACT)
+    assert tt.probe(deep) is None
+    assert tt.probe(shallow) == (1, 4, EXACT, None)
+
+
+def test_tt_size():
+    small = TranspositionTable(size_mb=1)
+    big = TranspositionTable(size_mb=4)
+    assert big.entries.nbytes <= 4 * 2 ** 20
+    assert big.n_buckets == 4 * small.n_buckets
+
+
+def test_iterative_deepening_timeout():
+    b = ChessBoard()
+    t0 = time.time()
+    score, move = iterative_deepening(b, eval_chess_board, 20, max_t=0.5)
+    assert time.time() - t0 < 2.0, "should abort part way through an iteration"
+    assert move in b.moves()
+    assert b.past_moves == [], "board should be restored after aborting"
+    assert str(b) == str(ChessBoard())
+
+
+def test_principal_variation():
+    b = TicTacToeBoard(turn="x")
+    b.board = np.array((("o", " ", " "), (" ", " ", " "), (" ", " ", " ")))
+    _, move = iterative_deepening(b, eval_tictactoe, 4)
+    pv = principal_variation(b)
+    assert pv[0] == move
+    assert len(pv) >= 2
+    assert b.past_moves == []
+
+
+def test_pvs_matches_minmax():
+    b = ChessBoard()
+    b.board = np.array(
+        (
+            "r . . . k . . r".split(),
+            "p . p p q p b .".split(),
+            "b n . . p n p .".split(),
+            ". . . P N . . .".split(),
+            ". p . . P . . .".split(),
+            ". . N . . Q . p".split(),
+            "P P P B B P P P".split(),
+            "R . . . K . . R".split(),
+        )
+    )
+    b._reset_piece_set()
+
+    def counting_eval(board, params={}):
+        counting_eval.calls += 1
+        return eval_chess_board(board, params)
+
+    results = {}
+    for search_fn in [minmax, pvs]:
+        TRANSPOSITION_TABLE.clear()
+        counting_eval.calls = 0
+        score, move = search_fn(b, counting_eval, 3)
+        results[search_fn] = (score, move, counting_eval.calls)
+
+    m_score, m_move, m_calls = results[minmax]
+    p_score, p_move, p_calls = results[pvs]
+    assert (m_score, m_move) == (p_score, p_move)
+    assert p_calls < m_calls
+
+
+def test_pvs_tictactoe():
+    # can stop a force win
+    b = TicTacToeBoard(turn="x")
+    b.board = np.array((("o", " ", " "), (" ", " ", " "), (" ", " ", " ")))
+    score, move = pvs(b, eval_tictactoe, 6)
+    assert score == 0
+    assert move == (1, 1)
+
+    # can do a force win
+    b = TicTacToeBoard(turn="o")
+    b.board = np.array((("o", " ", " "), ("x", " ", " "), (" ", " ", " ")))
+    score, move = pvs(b, eval_tictactoe, 6)
+    assert score <= 0.75 * -WIN_SCORE
+    assert move in [(0, 1), (0, 2), (1, 1)]  # there are many force victories
+    assert b.past_moves == []
@@ -108,3 +108,23 @@ def test_minmax_deep():
     # check board is unchanged after call to eval
     assert np.all(b.board == start)
     assert b.past_moves == []
+
+def test_hash():
+    b = TicTacToeBoard(turn="x")
+    start_hash = b.hash
+    b.do_move((1, 1))
+    b.do_move((0, 2))
+    h = b.hash
+
+    # same position reached by assigning the board gives the same hash
+    b2 = TicTacToeBoard(turn="x")
+    b2.board = np.array(((" ", " ", "o"), (" ", "x", " "), (" ", " ", " ")))
+    assert b2.hash == h
+
+    # side to move matters
+    b2.turn = "o"
+    assert b2.hash != h
+
+    b.undo_move()
+    b.undo_move()
+    assert b.hash == start_hash
@@ -5,10 +5,15 @@ from typing import Tuple
 
 import numpy as np
 
-from search import minmax
+from search import minmax, pvs
 
 WIN_SCORE = 1000
 
+# Zobrist keys for each mark on each square, see ChessBoard.hash
+_ZOBRIST_RNG = np.random.RandomState(2019)
+ZOBRIST_MARKS = {m: _ZOBRIST_RNG.randint(0, 2 ** 64, size=(3, 3), dtype=np.uint64).tolist() for m in ["x", "o"]}
+ZOBRIST_O_TO_MOVE = int(_ZOBRIST_RNG.randint(0, 2 ** 64, dtype=np.uint64))
+
 
 class TicTacToeBoard(object):
     TURNS = ["x", "o"]
@@ -19,6 +24,31 @@ class TicTacToeBoard(object):
         self.past_moves = []  # used to pop off and undo moves
         self.turn = turn  # "x" or "o"
 
+    @property
+    def board(self):
+        return self._board
+
+    @board.setter
+    def board(self, board):
+        """Assigning a new board array recomputes the hash.
+        NOTE: editing the array in place does not, call _reset_hash() after doing that."""
+        self._board = board
+        self._reset_hash()
+
+    @property
+    def hash(self) -> int:
+        """64 bit Zobrist hash of the position, including side to move"""
+        if self.turn == "o":
+            return self._hash ^ ZOBRIST_O_TO_MOVE
+        return self._hash
+
+    def _reset_hash(self):
+        """Recomputes the hash of the marks from the ground truth of the board"""
+        self._hash = 0
+        for mark, keys in ZOBRIST_MARKS.items():
+            for r, c in zip(*np.where(self._board == mark)):
+                self._hash ^= keys[r][c]
+
     def __str__(self):
         output = ""
         for i, row in enumerate(self.board):
@@ -47,12 +77,21 @@ class TicTacToeBoard(object):
         else:
             return "x"
 
+    def encode_move(self, move):
+        """Packs an (r, c) move into an int for the transposition table"""
+        return int(move[0]) * 3 + int(move[1])
+
+    def decode_move(self, code):
+        """Inverse of encode_move"""
+        return divmod(code, 3)
+
     def do_move(self, move):
         """Updates the game board object with the new move taken
         and the next player's turn set.
         move: (r, c) tuple of ints."""
 
         self.board[move] = self.turn
+        self._hash ^= ZOBRIST_MARKS[self.turn][move[0]][move[1]]
         self.turn = self.next_turn()
         self.past_moves.append(move)
 
@@ -61,6 +100,7 @@ class TicTacToeBoard(object):
         last_move = self.past_moves.pop()
         self.board[last_move] = " "
         self.turn = self.next_turn()
+        self._hash ^= ZOBRIST_MARKS[self.turn][last_move[0]][last_move[1]]
 
 
 def eval_tictactoe(board : TicTacToeBoard, params : dict = {}) -> Tuple[int, bool]:
@@ -108,7 +148,7 @@ def play_game():
                 print("Tie!")
                 return 0
 
-        score, move = minmax(b, eval_tictactoe, 9)
+        score, move = pvs(b, eval_tictactoe, 9)
         b.do_move(move)
         print(b)
         score, over = eval_tictactoe(b)
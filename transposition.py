@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""Fixed size transposition table for the search.
+
+Entries live in one preallocated numpy array, so memory use is set up front and never grows.
+Each bucket has two slots:
+    0: depth-preferred. only replaced by a deeper search, or by an entry from a newer search.
+    1: always-replace. gets everything that doesn't fit in slot 0.
+https://www.chessprogramming.org/Transposition_Table
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+DEFAULT_SIZE_MB = 16
+
+# bound flags: what the stored score means
+EMPTY = 0
+EXACT = 1  # the true score of the position
+LOWER = 2  # search failed high: true score >= stored score
+UPPER = 3  # search failed low: true score <= stored score
+
+NO_MOVE = 0xFFFF  # moves are stored as ints from board.encode_move
+
+ENTRY_DTYPE = np.dtype(
+    [
+        ("key", np.uint64),
+        ("depth", np.int16),
+        ("score", np.int32),
+        ("flag", np.uint8),
+        ("move", np.uint16),
+        ("age", np.uint8),
+    ]
+)
+BUCKET_SIZE = 2
+
+
+class TranspositionTable(object):
+    """Maps board.hash -> (depth, score, flag, move) with a fixed memory budget."""
+
+    def __init__(self, size_mb: float = DEFAULT_SIZE_MB) -> None:
+        self.n_buckets = max(1, int(size_mb * 2 ** 20) // (ENTRY_DTYPE.itemsize * BUCKET_SIZE))
+        self.entries = np.zeros((self.n_buckets, BUCKET_SIZE), dtype=ENTRY_DTYPE)
+        self.age = 0
+
+        # views of each field, indexing these is much faster than indexing records
+        self.keys = self.entries["key"]
+        self.depths = self.entries["depth"]
+        self.scores = self.entries["score"]
+        self.flags = self.entries["flag"]
+        self.moves = self.entries["move"]
+        self.ages = self.entries["age"]
+
+    def new_search(self) -> None:
+        """Call once per root search. Entries from older searches become the first to be replaced."""
+        self.age = (self.age + 1) % 256
+
+    def clear(self) -> None:
+        """Empty the table"""
+        self.entries.fill(0)
+        self.age = 0
+
+    def usage(self) -> float:
+        """Fraction of slots that are filled"""
+        return np.count_nonzero(self.flags) / self.flags.size
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, int, Optional[int]]]:
+        """Look up a position.
+        Returns (depth, score, flag, move) or None if the position isn't stored.
+        move is None if no best move was stored."""
+        b = key % self.n_buckets
+        for slot in range(BUCKET_SIZE):
+            if self.flags[b, slot] != EMPTY and self.keys[b, slot] == key:
+                move = int(self.moves[b, slot])
+                return (
+                    int(self.depths[b, slot]),
+                    int(self.scores[b, slot]),
+                    int(self.flags[b, slot]),
+                    None if move == NO_MOVE else move,
+                )
+        return None
+
+    def store(self, key: int, depth: int, score: int, flag: int, move: Optional[int] = None) -> None:
+        """Save a search result, using the depth-preferred + always-replace scheme."""
+        b = key % self.n_buckets
+        if (
+            self.flags[b, 0] == EMPTY
+            or self.keys[b, 0] == key
+            or depth >= self.depths[b, 0]
+            or self.ages[b, 0] != self.age
+        ):
+            slot = 0
+        else:
+            slot = 1
+
+        # keep the old best move if we don't have a new one for this position
+        if move is None:
+            if self.flags[b, slot] != EMPTY and self.keys[b, slot] == key:
+                move = int(self.moves[b, slot])
+            else:
+                move = NO_MOVE
+
+        self.keys[b, slot] = key
+        self.depths[b, slot] = depth
+        self.scores[b, slot] = score
+        self.flags[b, slot] = flag
+        self.moves[b, slot] = move
+        self.ages[b, slot] = self.age